@@ -1,4 +1,5 @@
 """Fill NA."""
+import hashlib
 import numpy as np
 import pandas as pd
 
@@ -13,6 +14,18 @@ try:
     from sklearn.impute import IterativeImputer
 except Exception:
     pass
+try:
+    from joblib import Parallel, delayed
+
+    joblib_present = True
+except Exception:
+    joblib_present = False
+try:
+    import bottleneck as bn
+
+    bottleneck_present = True
+except Exception:
+    bottleneck_present = False
 
 
 def fill_zero(df):
@@ -22,24 +35,95 @@ def fill_zero(df):
 
 
 def fillna_np(array, values):
-    if np.isnan(array.sum()):
-        array = np.nan_to_num(array) + np.isnan(array) * values
+    """Fill NaN in a numpy array in place with values (scalar or per column)."""
+    mask = np.isnan(array)
+    if mask.any():
+        np.copyto(array, np.broadcast_to(values, array.shape), where=mask)
     return array
 
 
 def fill_forward_alt(df):
     """Fill NaN with previous values."""
     # this is faster if only some columns have NaN
-    df2 = df.copy()
-    for i in df2.columns[df2.isnull().any(axis=0)]:
-        df2[i] = df2[i].fillna(method='ffill').fillna(method='bfill').fillna(0)
-    return df2
+    if not _is_float_frame(df):
+        df2 = df.copy()
+        for i in df2.columns[df2.isnull().any(axis=0)]:
+            df2[i] = df2[i].fillna(method='ffill').fillna(method='bfill').fillna(0)
+        return df2
+    arr = df.to_numpy(copy=True)
+    nan_cols = np.isnan(arr).any(axis=0)
+    arr[:, nan_cols] = _ffill_bfill_zero_np(arr[:, nan_cols])
+    return _to_frame(arr, df)
+
+
+def _is_float_frame(df):
+    """True if every column has the same plain numpy float dtype.
+
+    Mixed float32/float64 frames are excluded as to_numpy() would make them all float64.
+    """
+    dtypes = set(df.dtypes)
+    return len(dtypes) == 1 and all(
+        isinstance(x, np.dtype) and x.kind == 'f' for x in dtypes
+    )
+
+
+def _float_array(df, is_float: bool = None):
+    """Float numpy array of df, converted once for the numpy helpers.
+
+    A single float dtype keeps its width (float32 stays float32), others become float64.
+
+    Args:
+        is_float (bool): result of _is_float_frame(df), if already known
+
+    Returns:
+        (np.array, bool): the array, and True if it is a new array.
+            If False it may be a view of df and must be copied before writing to it.
+    """
+    if is_float is None:
+        is_float = _is_float_frame(df)
+    if is_float:
+        # a single float dtype comes back as a view of df's own data
+        return df.to_numpy(), False
+    # casting to float always makes a new array
+    return df.to_numpy(dtype=float), True
+
+
+def _to_frame(arr, df):
+    """Wrap a filled array back into a DataFrame shaped like df."""
+    return pd.DataFrame(arr, index=df.index, columns=df.columns, copy=False)
+
+
+def _ffill_bfill_zero_np(arr):
+    """Forward fill, then back fill leading NaN, then zero all-NaN columns.
+
+    Uses bottleneck.push in both directions if available, otherwise pandas.
+    Returns a new array, arr is not modified.
+    """
+    if arr.shape[0] == 0:
+        return arr.copy()
+    if bottleneck_present:
+        out = bn.push(arr, axis=0)
+        out = bn.push(out[::-1], axis=0)[::-1]
+    else:
+        out = (
+            pd.DataFrame(arr)
+            .fillna(method='ffill')
+            .fillna(method='bfill')
+            .to_numpy()
+        )
+    # anything still nan is an all-nan column, so the first row finds them
+    all_nan = np.isnan(out[0])
+    if all_nan.any():
+        out[:, all_nan] = 0
+    return out
 
 
 def fill_forward(df):
     """Fill NaN with previous values."""
-    df = df.fillna(method='ffill')
-    return df.fillna(method='bfill').fillna(0)
+    if not (bottleneck_present and _is_float_frame(df)):
+        df = df.fillna(method='ffill')
+        return df.fillna(method='bfill').fillna(0)
+    return _to_frame(_ffill_bfill_zero_np(df.to_numpy()), df)
 
 
 def fill_mean_old(df):
@@ -48,10 +132,32 @@ def fill_mean_old(df):
     return df
 
 
+def _fill_masked_np(arr, col_values):
+    """Fill NaN positions in place with the matching column value."""
+    rows, cols = np.nonzero(np.isnan(arr))
+    arr[rows, cols] = np.take(np.nan_to_num(col_values), cols)
+    # observed inf become the largest finite float, as with nan_to_num on the whole array
+    if np.isinf(arr).any():
+        np.nan_to_num(arr, copy=False)
+    return arr
+
+
+def _fill_mean_np(arr, copy: bool = True):
+    """Fill NaN with column mean, in place on arr if copy is False."""
+    col_mean = np.nanmean(arr, axis=0)
+    return _fill_masked_np(arr.copy() if copy else arr, col_mean)
+
+
+def _fill_median_np(arr, copy: bool = True):
+    """Fill NaN with column median, in place on arr if copy is False."""
+    col_median = np.nanmedian(arr, axis=0)
+    return _fill_masked_np(arr.copy() if copy else arr, col_median)
+
+
 def fill_mean(df):
-    arr = np.array(df)
-    arr = np.nan_to_num(arr) + np.isnan(arr) * np.nan_to_num(np.nanmean(arr, axis=0))
-    return pd.DataFrame(arr, index=df.index, columns=df.columns)
+    """Fill nan with mean values. Does not work with non-numeric types."""
+    arr, is_copy = _float_array(df)
+    return _to_frame(_fill_mean_np(arr, copy=not is_copy), df)
 
 
 def fill_median_old(df):
@@ -62,9 +168,8 @@ def fill_median_old(df):
 
 def fill_median(df):
     """Fill nan with median values. Does not work with non-numeric types."""
-    arr = np.array(df)
-    arr = np.nan_to_num(arr) + pd.isna(arr) * np.nan_to_num(np.nanmedian(arr, axis=0))
-    return pd.DataFrame(arr, index=df.index, columns=df.columns)
+    arr, is_copy = _float_array(df)
+    return _to_frame(_fill_median_np(arr, copy=not is_copy), df)
 
 
 def rolling_mean(df, window: int = 10):
@@ -73,12 +178,22 @@ def rolling_mean(df, window: int = 10):
     return df
 
 
+def _biased_ffill_np(arr, mean_weight: float = 1):
+    """Return a new array with NaN filled by weighted average of ffill and mean."""
+    mask = np.isnan(arr)
+    out = _ffill_bfill_zero_np(arr)
+    # only the nan positions need the weighted combination
+    rows, cols = np.nonzero(mask)
+    col_mean = np.nan_to_num(np.nanmean(arr, axis=0))
+    out[rows, cols] = (col_mean[cols] * mean_weight + out[rows, cols]) / (
+        1 + mean_weight
+    )
+    return out
+
+
 def biased_ffill(df, mean_weight: float = 1):
     """Fill NaN with average of last value and mean."""
-    df_mean = fill_mean(df)
-    df_ffill = fill_forward(df)
-    df = ((df_mean * mean_weight) + df_ffill) / (1 + mean_weight)
-    return df
+    return _to_frame(_biased_ffill_np(_float_array(df)[0], mean_weight), df)
 
 
 def fake_date_fill_old(df, back_method: str = 'slice'):
@@ -170,6 +285,83 @@ def fake_date_fill(df, back_method: str = 'slice'):
         raise ValueError('back_method not recognized in fake_date_fill')
 
 
+# imputed outputs of the sklearn imputers, keyed on method and a hash of the input
+_IMPUTER_CACHE = {}
+# total size limit of cached outputs, oldest are dropped first
+_IMPUTER_CACHE_BYTES = 2**26
+
+
+def _cached_fit_transform(df, method: str, imputer):
+    """Fit_transform an sklearn imputer, reusing the output for identical inputs.
+
+    Args:
+        df (pd.DataFrame): data to impute
+        method (str): FillNA method name, part of the cache key
+        imputer (object): unfitted sklearn imputer, used on cache miss, its params are part of the cache key
+    """
+    arr = df.to_numpy()
+    key = None
+    if arr.dtype.kind in 'biuf':
+        key = (
+            method,
+            repr(sorted(imputer.get_params().items())),
+            arr.shape,
+            arr.dtype.str,
+            hashlib.sha1(np.ascontiguousarray(arr).tobytes()).hexdigest(),
+        )
+    result = _IMPUTER_CACHE.get(key)
+    if result is None:
+        result = np.asarray(imputer.fit_transform(df))
+        if key is not None and result.nbytes <= _IMPUTER_CACHE_BYTES:
+            _IMPUTER_CACHE[key] = result
+            while sum(x.nbytes for x in _IMPUTER_CACHE.values()) > _IMPUTER_CACHE_BYTES:
+                _IMPUTER_CACHE.pop(next(iter(_IMPUTER_CACHE)))
+    # copied so the cached array can't be changed through the returned frame
+    return pd.DataFrame(result, index=df.index, columns=df.columns, copy=True)
+
+
+def fill_knn_faiss(df, n_neighbors: int = 5):
+    """Fill NaN with the mean of nearest neighbor rows, searched with faiss.
+
+    Rows are compared on data with NaN temporarily filled by column mean.
+    Donors missing the value in question are skipped.
+
+    Args:
+        df (pd.DataFrame): numeric data to impute
+        n_neighbors (int): number of donor rows to average
+    """
+    import faiss
+
+    arr = df.to_numpy(dtype=float, copy=True)
+    mask = np.isnan(arr)
+    rows = np.nonzero(mask.any(axis=1))[0]
+    if rows.size == 0:
+        return df
+    col_mean = np.nanmean(arr, axis=0)
+    base = np.ascontiguousarray(
+        _fill_masked_np(arr.copy(), col_mean), dtype=np.float32
+    )
+    index = faiss.IndexFlatL2(base.shape[1])
+    if hasattr(faiss, "StandardGpuResources") and faiss.get_num_gpus() > 0:
+        index = faiss.index_cpu_to_gpu(faiss.StandardGpuResources(), 0, index)
+    index.add(base)
+    # oversample as the row itself and donors with NaN are skipped
+    k = min(2 * n_neighbors + 1, base.shape[0])
+    _, nbrs = index.search(base[rows], k)
+    donors = arr[nbrs]
+    use = (
+        ~np.isnan(donors)
+        & (nbrs != rows[:, None])[..., None]
+        & (nbrs >= 0)[..., None]
+    )
+    use &= np.cumsum(use, axis=1) <= n_neighbors
+    count = use.sum(axis=1)
+    total = np.where(use, donors, 0).sum(axis=1)
+    fill = np.where(count > 0, total / np.maximum(count, 1), np.nan_to_num(col_mean))
+    arr[rows] = np.where(mask[rows], fill, arr[rows])
+    return pd.DataFrame(arr, index=df.index, columns=df.columns, copy=False)
+
+
 df_interpolate = {
     'linear': 0.1,
     'time': 0.1,
@@ -192,9 +384,152 @@ df_interpolate = {
     'slinear': 0.0,
 }
 df_interpolate_full = list(df_interpolate.keys())
+# methods handled directly on numpy arrays, skipping pandas per column dispatch
+fast_interpolate = ['linear', 'nearest', 'quadratic', 'cubic', 'pchip', 'akima']
+
 
+def _fast_interpolate(
+    arr, method: str = 'linear', x=None, n_jobs: int = 1, copy: bool = True
+):
+    """Interpolate interior and trailing NaN of each column of a 2d array.
 
-def FillNA(df, method: str = 'ffill', window: int = 10):
+    Matches pd.DataFrame.interpolate(method) with limit_direction='forward',
+    leading NaN are left in place.
+
+    Args:
+        arr (np.array): 2d float array, only modified if copy is False
+        method (str): one of fast_interpolate
+        x (np.array): numeric positions of rows, ignored for 'linear'
+        n_jobs (int): threads for the scipy methods, columns are split across them
+        copy (bool): if False, arr is filled in place and returned
+    """
+    from scipy import interpolate
+
+    out = arr.copy() if copy else arr
+    x = np.arange(arr.shape[0]) if method == 'linear' or x is None else x
+    mask = np.isnan(arr)
+
+    def _interpolate_col(j):
+        invalid = mask[:, j].copy()
+        valid = ~invalid
+        # leading nan are preserved, as in pandas
+        invalid[: np.argmax(valid)] = False
+        if not invalid.any():
+            return
+        xv, yv, xn = x[valid], arr[valid, j], x[invalid]
+        if method == 'linear':
+            out[invalid, j] = np.interp(xn, xv, yv)
+        elif method == 'pchip':
+            out[invalid, j] = interpolate.pchip_interpolate(xv, yv, xn)
+        elif method == 'akima':
+            out[invalid, j] = interpolate.Akima1DInterpolator(xv, yv)(xn)
+        else:
+            out[invalid, j] = interpolate.interp1d(
+                xv, yv, kind=method, fill_value=np.nan, bounds_error=False
+            )(xn)
+
+    cols = np.nonzero(mask.any(axis=0) & ~mask.all(axis=0))[0]
+    # np.interp is too quick to be worth the thread overhead, as are few columns
+    if joblib_present and n_jobs != 1 and method != 'linear' and len(cols) >= 8:
+        # each thread writes to its own columns of out
+        Parallel(n_jobs=n_jobs, backend='threading')(
+            delayed(_interpolate_col)(j) for j in cols
+        )
+    else:
+        for j in cols:
+            _interpolate_col(j)
+    return out
+
+
+def fill_interpolate(df, method: str = 'linear', n_jobs: int = 1):
+    """Fill NaN with a pd.DataFrame.interpolate method, then fill the ends.
+
+    Args:
+        method (str): interpolation method, see df_interpolate
+        n_jobs (int): threads for column-wise scipy interpolation
+    """
+    x = df.index.to_numpy()
+    if np.issubdtype(x.dtype, np.datetime64):
+        x = x.view("i8")
+    if (
+        method in fast_interpolate
+        and _is_float_frame(df)
+        and (method == 'linear' or np.issubdtype(x.dtype, np.number))
+    ):
+        # bfill of leading nan then ffill of trailing nan
+        arr, is_copy = _float_array(df, is_float=True)
+        arr = _fast_interpolate(arr, method, x, n_jobs=n_jobs, copy=not is_copy)
+        return _to_frame(_ffill_bfill_zero_np(arr), df)
+    df = df.interpolate(method=method, order=5).fillna(method='bfill')
+    if df.isnull().values.any():
+        df = fill_forward(df)
+    return df
+
+
+def fill_knn_faiss_or_sklearn(df, n_neighbors: int = 5):
+    """fill_knn_faiss if faiss is installed, otherwise sklearn KNNImputer."""
+    try:
+        return fill_knn_faiss(df, n_neighbors=n_neighbors)
+    except ImportError:
+        return _cached_fit_transform(
+            df, 'KNNImputer', KNNImputer(n_neighbors=n_neighbors)
+        )
+
+
+# FillNA method name: function of (df, window, n_jobs)
+fillna_methods = {
+    'zero': lambda df, window, n_jobs: fill_zero(df),
+    'ffill': lambda df, window, n_jobs: fill_forward(df),
+    'mean': lambda df, window, n_jobs: fill_mean(df),
+    'median': lambda df, window, n_jobs: fill_median(df),
+    'rolling_mean': lambda df, window, n_jobs: rolling_mean(df, window=window),
+    'rolling_mean_24': lambda df, window, n_jobs: rolling_mean(df, window=24),
+    'ffill_mean_biased': lambda df, window, n_jobs: biased_ffill(df),
+    'fake_date': lambda df, window, n_jobs: fake_date_fill(df, back_method='slice'),
+    'fake_date_slice': lambda df, window, n_jobs: fake_date_fill(
+        df, back_method='slice_all'
+    ),
+    'IterativeImputer': lambda df, window, n_jobs: _cached_fit_transform(
+        df,
+        'IterativeImputer',
+        IterativeImputer(random_state=0, max_iter=10, tol=1e-3),
+    ),
+    'IterativeImputerExtraTrees': lambda df, window, n_jobs: _cached_fit_transform(
+        df,
+        'IterativeImputerExtraTrees',
+        IterativeImputer(
+            ExtraTreesRegressor(
+                n_estimators=10, max_depth=10, n_jobs=n_jobs, random_state=0
+            ),
+            random_state=0,
+            max_iter=100,
+        ),
+    ),
+    'KNNImputer': lambda df, window, n_jobs: _cached_fit_transform(
+        df, 'KNNImputer', KNNImputer(n_neighbors=5)
+    ),
+    'FAISSKNNImputer': lambda df, window, n_jobs: fill_knn_faiss_or_sklearn(df, 5),
+    'None': lambda df, window, n_jobs: df,
+}
+# methods that can work directly on the float array of a float frame
+# function of (arr, copy), copy False if arr may be filled in place
+_fillna_np_methods = {
+    'ffill': lambda arr, copy: _ffill_bfill_zero_np(arr),
+    'mean': _fill_mean_np,
+    'median': _fill_median_np,
+    'ffill_mean_biased': lambda arr, copy: _biased_ffill_np(arr),
+}
+# 'zero' above takes precedence over the interpolate method of the same name
+for _method in df_interpolate_full:
+    fillna_methods.setdefault(
+        _method,
+        lambda df, window, n_jobs, method=_method: fill_interpolate(
+            df, method, n_jobs=n_jobs
+        ),
+    )
+
+
+def FillNA(df, method: str = 'ffill', window: int = 10, n_jobs: int = 1):
     """Fill NA values using different methods.
 
     Args:
@@ -206,84 +541,34 @@ def FillNA(df, method: str = 'ffill', window: int = 10):
             'rolling mean' - fill with last n (window) values
             'ffill mean biased' - simple avg of ffill and mean
             'fake date' - shifts forward data over nan, thus values will have incorrect timestamps
+            'KNNImputer' - sklearn KNNImputer
+            'FAISSKNNImputer' - mean of nearest rows found with faiss, KNNImputer if faiss not installed
             also most `method` values of pd.DataFrame.interpolate()
+            any other key of fillna_methods
         window (int): length of rolling windows for filling na, for rolling methods
+        n_jobs (int): threads used by methods that parallelize across columns
+
+    Returns:
+        pd.DataFrame, the input object itself (not a copy) if it has no NaN to fill
     """
     method = str(method).replace(" ", "_")
 
-    if method == 'zero':
-        return fill_zero(df)
-
-    elif method == 'ffill':
-        return fill_forward(df)
-
-    elif method == 'mean':
-        return fill_mean(df)
-
-    elif method == 'median':
-        return fill_median(df)
-
-    elif method == 'rolling_mean':
-        return rolling_mean(df, window=window)
-
-    elif method == 'rolling_mean_24':
-        return rolling_mean(df, window=24)
-
-    elif method == 'ffill_mean_biased':
-        return biased_ffill(df)
-
-    elif method == 'fake_date':
-        return fake_date_fill(df, back_method='slice')
-
-    elif method == 'fake_date_slice':
-        return fake_date_fill(df, back_method='slice_all')
-
-    elif method in df_interpolate_full:
-        df = df.interpolate(method=method, order=5).fillna(method='bfill')
-        if df.isnull().values.any():
-            df = fill_forward(df)
-        return df
-
-    elif method == 'IterativeImputer':
-        cols = df.columns
-        indx = df.index
-
-        df = IterativeImputer(random_state=0, max_iter=100).fit_transform(df)
-        if not isinstance(df, pd.DataFrame):
-            df = pd.DataFrame(df)
-            df.index = indx
-            df.columns = cols
-        return df
-
-    elif method == 'IterativeImputerExtraTrees':
-        cols = df.columns
-        indx = df.index
-
-        df = IterativeImputer(
-            ExtraTreesRegressor(n_estimators=10, random_state=0),
-            random_state=0,
-            max_iter=100,
-        ).fit_transform(df)
-        if not isinstance(df, pd.DataFrame):
-            df = pd.DataFrame(df)
-            df.index = indx
-            df.columns = cols
-        return df
-
-    elif method == 'KNNImputer':
-        cols = df.columns
-        indx = df.index
-
-        df = KNNImputer(n_neighbors=5).fit_transform(df)
-        if not isinstance(df, pd.DataFrame):
-            df = pd.DataFrame(df)
-            df.index = indx
-            df.columns = cols
-        return df
-
-    elif method is None or method == 'None':
-        return df
-
-    else:
+    fill_function = fillna_methods.get(method)
+    if fill_function is None:
         print(f"FillNA method `{str(method)}` not known, returning original")
         return df
+    # converted once here and reused by the numpy methods
+    arr = df.to_numpy()
+    if arr.dtype.kind in 'biu':
+        # int and bool columns can't hold NaN
+        return df
+    if arr.dtype.kind == 'f':
+        # nothing to fill, skip the imputation entirely
+        if not np.isnan(arr).any():
+            return df
+        np_function = _fillna_np_methods.get(method)
+        # dtype check only when it is needed, it costs as much as the fill
+        if np_function is not None and _is_float_frame(df):
+            # arr is likely a view of df, so the method copies before filling
+            return _to_frame(np_function(arr, True), df)
+    return fill_function(df, window, n_jobs)
@@ -3036,7 +3036,7 @@ class GeneralTransformer(object):
         else:
             self.nan_flag = np.isnan(np.min(np.array(df)))
         if self.nan_flag:
-            return FillNA(df, method=self.fillna, window=window)
+            return FillNA(df, method=self.fillna, window=window, n_jobs=self.n_jobs)
         else:
             return df
 
@@ -19,6 +19,7 @@ extras = {
         'lightgbm',
         'psutil',
         'joblib',
+        'bottleneck',
     ]
 }
 
@@ -5,10 +5,20 @@ Created on Wed May  4 21:26:27 2022
 @author: Colin
 """
 import unittest
+from unittest.mock import patch
 import numpy as np
 import pandas as pd
+from sklearn.impute import KNNImputer
+from autots.tools import impute
 from autots.tools.impute import FillNA
 
+try:
+    import faiss  # noqa
+
+    faiss_present = True
+except Exception:
+    faiss_present = False
+
 class TestImpute(unittest.TestCase):
 
     def test_impute(self):
@@ -25,6 +35,13 @@ class TestImpute(unittest.TestCase):
         filled = FillNA(df_nan, method='median')
         self.assertTrue((filled.values.flatten() == np.array([5, 5, 10, 50, 15, 15, 10, 12.5, 10, 10])).all())
 
+        # inf is replaced by the largest finite float
+        df_inf = pd.DataFrame({'a': [1, np.inf, np.nan], 'b': [-np.inf, 2, 4]})
+        big = np.finfo(float).max
+        for method in ['mean', 'median']:
+            filled = FillNA(df_inf, method=method)
+            self.assertTrue((filled.values.flatten() == np.array([1, -big, big, 2, big, 4])).all())
+
         df_nan = pd.DataFrame({
             'a': [5, 10, 15, np.nan, 10],
             'b': [5, 50, 15, np.nan, 10],
@@ -38,3 +55,161 @@ class TestImpute(unittest.TestCase):
         })
         filled = FillNA(df_nan, method='fake_date_slice')
         self.assertTrue((filled.values.flatten() == np.array([ 5,  5, 10, 50, 15, 15, 10, 10])).all())
+
+    def test_fast_interpolate(self):
+        df_nan = pd.DataFrame({
+            'a': [np.nan, 10, 15, np.nan, 10, 12, np.nan],
+            'b': [5, 50, 15, np.nan, np.nan, 10, 8],
+        }, index=pd.date_range("2022-01-01", periods=7, freq="D"))
+        for method in ['linear', 'pchip', 'cubic']:
+            with self.subTest(method=method):
+                filled = FillNA(df_nan, method=method)
+                expected = df_nan.interpolate(method=method).fillna(method='bfill').fillna(method='ffill')
+                self.assertTrue(np.allclose(filled.values, expected.values))
+
+    def test_fillna_no_nan(self):
+        clean = pd.DataFrame({'a': [5.0, 10.0, 15.0], 'b': [1.0, 2.0, 3.0]})
+        clean_int = clean.astype(int)
+        for method in ['ffill', 'zero', 'mean', 'linear', 'KNNImputer']:
+            with self.subTest(method=method):
+                self.assertIs(FillNA(clean, method=method), clean)
+                self.assertIs(FillNA(clean_int, method=method), clean_int)
+        with patch('builtins.print') as mock_print:
+            self.assertIs(FillNA(clean, method='not_a_method'), clean)
+        mock_print.assert_called_once()
+
+    def test_imputer_cache(self):
+        df_nan = pd.DataFrame({
+            'a': [5, 10, 15, np.nan, 10, 12],
+            'b': [5, 50, 15, 20, np.nan, 10],
+        }, dtype=float)
+        impute._IMPUTER_CACHE.clear()
+        first = FillNA(df_nan, method='KNNImputer')
+        self.assertEqual(len(impute._IMPUTER_CACHE), 1)
+        self.assertFalse(first.isnull().values.any())
+        # changing the returned frame must not change the cached result
+        first.iloc[0, 0] = -100
+        second = FillNA(df_nan, method='KNNImputer')
+        self.assertEqual(len(impute._IMPUTER_CACHE), 1)
+        self.assertEqual(second.iloc[0, 0], 5)
+        self.assertTrue(np.allclose(second.values[1:], first.values[1:]))
+
+        # oldest entries are dropped once over the byte limit
+        with patch.object(impute, '_IMPUTER_CACHE_BYTES', df_nan.to_numpy().nbytes):
+            FillNA(df_nan + 1, method='KNNImputer')
+            self.assertEqual(len(impute._IMPUTER_CACHE), 1)
+            FillNA(df_nan + 2, method='KNNImputer')
+            self.assertEqual(len(impute._IMPUTER_CACHE), 1)
+            key = next(iter(impute._IMPUTER_CACHE))
+            self.assertTrue(np.allclose(impute._IMPUTER_CACHE[key], FillNA(df_nan + 2, method='KNNImputer').values))
+        impute._IMPUTER_CACHE.clear()
+
+        # other imputer params must not reuse the cached result
+        FillNA(df_nan, method='KNNImputer')
+        with patch.dict('sys.modules', {'faiss': None}):
+            result = impute.fill_knn_faiss_or_sklearn(df_nan, n_neighbors=2)
+        expected = KNNImputer(n_neighbors=2).fit_transform(df_nan)
+        self.assertTrue(np.allclose(result.values, expected))
+        self.assertEqual(len(impute._IMPUTER_CACHE), 2)
+        impute._IMPUTER_CACHE.clear()
+
+    @unittest.skipUnless(faiss_present, "faiss not installed")
+    def test_faiss_knn(self):
+        rng = np.random.default_rng(0)
+        arr = rng.normal(size=(50, 4)).cumsum(axis=0)
+        arr[rng.random(arr.shape) < 0.2] = np.nan
+        df_nan = pd.DataFrame(arr, columns=['a', 'b', 'c', 'd'])
+        filled = FillNA(df_nan, method='FAISSKNNImputer')
+        self.assertFalse(filled.isnull().values.any())
+        observed = ~np.isnan(arr)
+        self.assertTrue((filled.values[observed] == arr[observed]).all())
+
+        # row 1 is the closest donor to row 0 but is missing 'c' so is skipped
+        # rows 2 and 3 are used, row 4 is too far away
+        df_nan = pd.DataFrame({
+            'a': [0, 0.1, 0.2, 0.3, 100],
+            'b': [0, 0.1, 0.2, 0.3, 100],
+            'c': [np.nan, np.nan, 10, 20, 1000],
+            'd': np.nan,
+        })
+        filled = impute.fill_knn_faiss(df_nan, n_neighbors=2)
+        self.assertEqual(filled.loc[0, 'c'], 15)
+        # all nan column falls back to zero
+        self.assertTrue((filled['d'] == 0).all())
+        self.assertTrue((filled[['a', 'b']].values == df_nan[['a', 'b']].values).all())
+
+    def test_faiss_knn_fallback(self):
+        df_nan = pd.DataFrame({
+            'a': [5, 10, 15, np.nan, 10, 12],
+            'b': [5, 50, 15, 20, np.nan, 10],
+        }, dtype=float)
+        # a None entry in sys.modules makes `import faiss` raise ImportError
+        with patch.dict('sys.modules', {'faiss': None}):
+            filled = impute.fill_knn_faiss_or_sklearn(df_nan, n_neighbors=5)
+        expected = KNNImputer(n_neighbors=5).fit_transform(df_nan)
+        self.assertTrue(np.allclose(filled.values, expected))
+
+    def test_fast_interpolate_threaded(self):
+        rng = np.random.default_rng(1)
+        arr = rng.normal(size=(60, 12)).cumsum(axis=0)
+        arr[rng.random(arr.shape) < 0.2] = np.nan
+        arr[0, :] = np.nan
+        df_nan = pd.DataFrame(arr, index=pd.date_range("2022-01-01", periods=60, freq="D"))
+        for method in ['pchip', 'cubic', 'akima']:
+            with self.subTest(method=method):
+                # 12 nan columns is over the threshold for splitting across threads
+                filled = impute.fill_interpolate(df_nan, method=method, n_jobs=2)
+                expected = df_nan.interpolate(method=method).fillna(method='bfill').fillna(method='ffill')
+                self.assertTrue(np.allclose(filled.values, expected.values))
+                self.assertTrue(np.allclose(FillNA(df_nan, method=method, n_jobs=2).values, expected.values))
+
+    def test_fillna_np(self):
+        arr = np.array([[1, np.nan, np.nan], [np.nan, 4, np.nan]])
+        values = np.array([7, 8, 9])
+        # baseline result, computed before the in place fill
+        expected = np.nan_to_num(arr) + np.isnan(arr) * values
+        result = impute.fillna_np(arr, values)
+        self.assertTrue((result == expected).all())
+        # filled in place
+        self.assertIs(result, arr)
+        arr32 = np.array([np.nan, 2, np.nan], dtype=np.float32)
+        impute.fillna_np(arr32, 0)
+        self.assertEqual(arr32.dtype, np.float32)
+        self.assertTrue((arr32 == np.array([0, 2, 0])).all())
+
+    def test_ffill_methods(self):
+        """Numpy ffill based fills against the pandas versions they replace."""
+        def ffill(df):
+            return df.fillna(method='ffill').fillna(method='bfill').fillna(0)
+
+        def biased(df, weight):
+            return (impute.fill_mean_old(df) * weight + ffill(df)) / (1 + weight)
+
+        # (name, function, expected)
+        cases = [
+            ('fill_forward', impute.fill_forward, ffill),
+            ('FillNA ffill', lambda df: FillNA(df, method='ffill'), ffill),
+            ('fill_forward_alt', impute.fill_forward_alt, ffill),
+            ('biased_ffill', lambda df: impute.biased_ffill(df, mean_weight=2), lambda df: biased(df, 2)),
+            ('FillNA ffill_mean_biased', lambda df: FillNA(df, method='ffill_mean_biased'), lambda df: biased(df, 1)),
+        ]
+        # leading nan, an all-nan column, and a clean column
+        df_nan = pd.DataFrame({
+            'a': [np.nan, np.nan, 15, np.nan, 10, np.nan],
+            'b': [5, 50, np.nan, np.nan, 20, 10],
+            'c': np.nan,
+            'd': [1, 2, 3, 4, 5, 6],
+        }, dtype=float, index=pd.date_range("2022-01-01", periods=6, freq="D"))
+        frames = [df_nan, df_nan.astype('float32'), df_nan.iloc[:0]]
+        # the bottleneck and pandas paths, where bottleneck is installed
+        bottleneck_options = [True, False] if impute.bottleneck_present else [False]
+
+        for present in bottleneck_options:
+            for name, function, expected in cases:
+                for df in frames:
+                    with self.subTest(name, bottleneck=present, dtype=str(df.dtypes.iloc[0]), rows=len(df)):
+                        original = df.copy()
+                        with patch.object(impute, 'bottleneck_present', present):
+                            pd.testing.assert_frame_equal(function(df), expected(df))
+                        # input is left unchanged
+                        pd.testing.assert_frame_equal(df, original)